@@ -5,17 +5,15 @@ Bubblewrap sandboxing wrapper for Claude CLI.
 
 import sys
 import os
-from pathlib import Path
-import subprocess
 import bw_lib
 
 def get_claude_path():
     """Return the path to the Claude CLI executable."""
-    claude_path = Path.home() / ".claude" / "local" / "claude"
-    if not claude_path.exists():
+    claude_path = os.path.join(bw_lib.get_home(), ".claude", "local", "claude")
+    if not os.path.exists(claude_path):
         print(f"Error: Claude CLI not found at {claude_path}", file=sys.stderr)
         sys.exit(1)
-    return str(claude_path)
+    return claude_path
 
 CLAUDE_CONFIG = {
     "name": "claude",
@@ -35,8 +33,9 @@ def main():
     prog_name = f"bw-{CLAUDE_CONFIG['name']}"
     args = bw_lib.parse_args(prog_name, CLAUDE_CONFIG['name'], CLAUDE_CONFIG)
 
-    target_dir = Path(args.dir).absolute() if args.dir else Path.cwd()
-    if args.dir and not target_dir.is_dir():
+    # Validate the target directory once; build_bwrap_command trusts it
+    target_dir = os.path.abspath(args.dir) if args.dir else os.getcwd()
+    if not bw_lib.is_directory(target_dir):
         print(f"Error: Directory does not exist: {target_dir}", file=sys.stderr)
         sys.exit(1)
 
@@ -46,11 +45,12 @@ def main():
             cli_path = CLAUDE_CONFIG["get_cli_path"]()
 
         bwrap_cmd = bw_lib.build_bwrap_command(
-            cli_path, args, CLAUDE_CONFIG, target_dir
+            cli_path, args, CLAUDE_CONFIG, target_dir, pwd_validated=True
         )
 
-        proc = subprocess.run(bwrap_cmd, text=args.shell)
-        sys.exit(proc.returncode)
+        # Replace this process with bwrap rather than waiting on a child;
+        # there's nothing to do after it exits
+        bw_lib.exec_bwrap(bwrap_cmd)
 
     except FileNotFoundError:
         print("Error: bwrap not found. Please install bubblewrap.", file=sys.stderr)
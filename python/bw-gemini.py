@@ -5,23 +5,25 @@ Bubblewrap sandboxing wrapper for Gemini CLI.
 
 import sys
 import os
-from pathlib import Path
-import subprocess
+import functools
 import bw_lib
 
+@functools.lru_cache(maxsize=None)
 def get_gemini_path():
     """Return the path to the Gemini CLI executable."""
     # This is a placeholder path.
     # User may need to adjust this depending on how Gemini CLI is installed.
-    gemini_path = Path.home() / ".local" / "bin" / "gemini"
-    if not gemini_path.exists():
-        # Fallback to checking PATH
+    gemini_path = os.path.join(bw_lib.get_home(), ".local", "bin", "gemini")
+    if not os.path.exists(gemini_path):
+        # Fallback to checking PATH, keeping the absolute path so the PATH
+        # walk isn't repeated
         import shutil
-        if shutil.which("gemini"):
-            return "gemini"
+        resolved = shutil.which("gemini")
+        if resolved:
+            return resolved
         print(f"Error: Gemini CLI not found at {gemini_path} or in PATH", file=sys.stderr)
         sys.exit(1)
-    return str(gemini_path)
+    return gemini_path
 
 GEMINI_CONFIG = {
     "name": "gemini",
@@ -44,8 +46,9 @@ def main():
     prog_name = f"bw-{GEMINI_CONFIG['name']}"
     args = bw_lib.parse_args(prog_name, GEMINI_CONFIG['name'], GEMINI_CONFIG)
 
-    target_dir = Path(args.dir).absolute() if args.dir else Path.cwd()
-    if args.dir and not target_dir.is_dir():
+    # Validate the target directory once; build_bwrap_command trusts it
+    target_dir = os.path.abspath(args.dir) if args.dir else os.getcwd()
+    if not bw_lib.is_directory(target_dir):
         print(f"Error: Directory does not exist: {target_dir}", file=sys.stderr)
         sys.exit(1)
 
@@ -55,11 +58,12 @@ def main():
             cli_path = GEMINI_CONFIG["get_cli_path"]()
 
         bwrap_cmd = bw_lib.build_bwrap_command(
-            cli_path, args, GEMINI_CONFIG, target_dir
+            cli_path, args, GEMINI_CONFIG, target_dir, pwd_validated=True
         )
 
-        proc = subprocess.run(bwrap_cmd, text=args.shell)
-        sys.exit(proc.returncode)
+        # Replace this process with bwrap rather than waiting on a child;
+        # there's nothing to do after it exits
+        bw_lib.exec_bwrap(bwrap_cmd)
 
     except FileNotFoundError:
         print("Error: bwrap not found. Please install bubblewrap.", file=sys.stderr)
@@ -5,11 +5,10 @@ Common library for Bubblewrap sandboxing wrappers.
 
 import os
 import sys
-import argparse
-import subprocess
-import uuid
+import functools
+import signal
+import stat
 from pathlib import Path
-import tempfile
 
 # Directories safe to mount from home when using safe mode (default)
 # NOTE: Documents and Downloads are NOT included by default as they often
@@ -40,15 +39,37 @@ SAFE_CONFIG_DIRS = [
 # Essential /etc files to mount (minimal /etc)
 ESSENTIAL_ETC_FILES = ["hostname", "hosts", "resolv.conf", "passwd", "group"]
 
-# Additional directories to mount (handled separately in mount_minimal_etc)
+# Additional directories to mount (part of _STATIC_BWRAP_PREFIX)
 ESSENTIAL_ETC_DIRS = [
     "pki", "ssl", "crypto-policies",
 ]
 
 
+# Interned bwrap option names, shared by every argument list built below
+_RO_BIND = sys.intern("--ro-bind")
+_RO_BIND_TRY = sys.intern("--ro-bind-try")
+_BIND = sys.intern("--bind")
+_BIND_TRY = sys.intern("--bind-try")
+_SETENV = sys.intern("--setenv")
+
+
+@functools.lru_cache(maxsize=None)
+def get_home():
+    """Return the user's home directory (cached for the process lifetime)."""
+    return str(Path.home())
+
+
+def is_directory(path):
+    """Return whether path is an existing directory, using a single stat."""
+    try:
+        return stat.S_ISDIR(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
 def create_tmp_export_dir(tool_name):
     """Create an isolated /tmp export directory in the real /tmp."""
-    session_id = str(uuid.uuid4())[:8]
+    session_id = os.urandom(4).hex()
     export_dir = Path("/tmp") / f"bw-{tool_name}-{session_id}"
     export_dir.mkdir(exist_ok=True, mode=0o755)
     return str(export_dir)
@@ -56,59 +77,195 @@ def create_tmp_export_dir(tool_name):
 
 def ensure_tool_dir_exists(target_dir, tool_name):
     """Create the project .<tool_name> directory if it doesn't exist."""
-    tool_dir = target_dir / f".{tool_name}"
-    if not tool_dir.exists():
-        tool_dir.mkdir(exist_ok=True)
+    tool_dir = os.path.join(target_dir, f".{tool_name}")
+    if not os.path.exists(tool_dir):
+        try:
+            os.mkdir(tool_dir)
+        except FileExistsError:
+            # Another launch in the same project created it first
+            pass
 
 
-def mount_minimal_etc(cmd):
-    """Create a minimal /etc with only essential files.
+_ESSENTIAL_ETC_NAMES = frozenset(ESSENTIAL_ETC_FILES + ESSENTIAL_ETC_DIRS)
 
-    Creates an empty tmpfs for /etc, then bind mounts only the specific
-    files and directories needed for basic operation. This minimizes
-    exposure of sensitive files like /etc/shadow.
-    """
-    # Create empty /etc
-    cmd.extend(["--tmpfs", "/etc"])
 
-    # Mount individual essential files
+def _scan_etc():
+    """Return the essential /etc names that resolve to a file or directory."""
+    # Match the name first so only essential symlinks cost a stat()
+    try:
+        with os.scandir("/etc") as it:
+            return {
+                entry.name for entry in it
+                if entry.name in _ESSENTIAL_ETC_NAMES
+                and (entry.is_file() or entry.is_dir())
+            }
+    except OSError:
+        return set()
+
+
+# Snapshot of /etc taken once at import; it doesn't change within a session
+_ETC_PRESENT = _scan_etc()
+
+
+def _etc_file_args():
+    """Return bind arguments for the essential /etc files that exist."""
+    args = []
     for filename in ESSENTIAL_ETC_FILES:
-        filepath = f"/etc/{filename}"
-        cmd.extend(["--ro-bind-try", filepath, filepath])
+        if filename in _ETC_PRESENT:
+            filepath = f"/etc/{filename}"
+            args.extend([_RO_BIND, filepath, filepath])
+    return args
+
 
-    # Mount essential directories
+def _etc_dir_args():
+    """Return bind arguments for the essential /etc directories that exist."""
+    args = []
     for dirname in ESSENTIAL_ETC_DIRS:
-        dirpath = f"/etc/{dirname}"
-        cmd.extend(["--ro-bind-try", dirpath, dirpath])
+        if dirname in _ETC_PRESENT:
+            dirpath = f"/etc/{dirname}"
+            args.extend([_RO_BIND, dirpath, dirpath])
+    return args
 
-    # Special handling for /etc/resolv.conf if it's a symlink
-    resolv_conf = Path("/etc/resolv.conf")
-    if resolv_conf.exists() and resolv_conf.is_symlink():
-        # Resolve the symlink and bind the real file
-        real_resolv = resolv_conf.resolve()
-        cmd.extend(["--ro-bind-try", str(real_resolv), "/etc/resolv.conf"])
+
+@functools.lru_cache(maxsize=None)
+def _find_bwrap():
+    """Return the absolute path to bwrap, or "bwrap" if it isn't on PATH."""
+    import shutil
+    return shutil.which("bwrap") or "bwrap"
+
+
+# Arguments that are the same on every invocation, built once at import.
+# The bwrap binary itself is resolved lazily by _find_bwrap().
+# A minimal /etc is an empty tmpfs with only the essential files and
+# directories bound into it, which minimizes exposure of sensitive files
+# like /etc/shadow.
+_STATIC_BWRAP_PREFIX = (
+    "--die-with-parent", "--unshare-pid", "--unshare-ipc",
+    "--tmpfs", "/etc",
+    *_etc_file_args(),
+    *_etc_dir_args(),
+    # Create /bin as symlink to /usr/bin for compatibility
+    "--symlink", "/usr/bin", "/bin",
+    # Process and device access
+    "--proc", "/proc", "--dev-bind", "/dev", "/dev",
+    # Root filesystem setup
+    "--tmpfs", "/root",
+)
+
+
+def _resolve_resolv_conf():
+    """Return the real path of /etc/resolv.conf if it's a symlink, else None."""
+    resolv_conf = "/etc/resolv.conf"
+    try:
+        st = os.lstat(resolv_conf)
+    except OSError:
+        return None
+    if not stat.S_ISLNK(st.st_mode):
+        return None
+    real_resolv = os.path.realpath(resolv_conf)
+    return real_resolv if os.path.exists(real_resolv) else None
+
+
+# The resolv.conf symlink target doesn't change during the process lifetime
+_RESOLV_CONF_REAL = _resolve_resolv_conf()
+
+
+def mount_minimal_etc(cmd):
+    """Bind the real /etc/resolv.conf if it's a symlink.
+
+    The rest of the minimal /etc is part of _STATIC_BWRAP_PREFIX.
+    """
+    if _RESOLV_CONF_REAL:
+        cmd.extend([_RO_BIND_TRY, _RESOLV_CONF_REAL, "/etc/resolv.conf"])
+
+
+# (path, parent, basename) for each safe home entry, so nested entries like
+# ".local/share" can be looked up in a listing of their parent directory
+_SAFE_HOME_ENTRIES = tuple((name,) + os.path.split(name) for name in SAFE_HOME_DIRS)
+# parent -> the safe basenames to look for in it
+_SAFE_HOME_PARENTS = {
+    parent: frozenset(base for _, p, base in _SAFE_HOME_ENTRIES if p == parent)
+    for _, parent, _ in _SAFE_HOME_ENTRIES
+}
+_SAFE_CONFIG_NAMES = frozenset(SAFE_CONFIG_DIRS)
+
+
+def _list_dir_names(path, names):
+    """Return which of names exist in a directory (empty if unreadable).
+
+    Like os.path.exists(), dangling symlinks don't count as existing; only
+    candidate symlinks pay for the extra stat.
+    """
+    try:
+        with os.scandir(path) as it:
+            return {
+                entry.name for entry in it
+                if entry.name in names
+                and (not entry.is_symlink() or os.path.exists(entry.path))
+            }
+    except OSError:
+        return set()
 
 
 def mount_safe_home_dirs(cmd, home):
-    """Mount only safe directories from home."""
-    for dir_name in SAFE_HOME_DIRS:
-        dir_path = os.path.join(home, dir_name)
-        if os.path.exists(dir_path):
-            cmd.extend(["--ro-bind", dir_path, dir_path])
+    """Mount only safe directories from home.
+
+    Each parent directory is listed once with scandir instead of stat()ing
+    every candidate path.
+    """
+    # home is absolute and the entries are simple relative names, so plain
+    # concatenation is enough
+    home_slash = home + "/"
+    listings = {
+        parent: _list_dir_names(f"{home_slash}{parent}", bases)
+        for parent, bases in _SAFE_HOME_PARENTS.items()
+    }
+    present = [
+        f"{home_slash}{dir_name}"
+        for dir_name, parent, base in _SAFE_HOME_ENTRIES
+        if base in listings[parent]
+    ]
+    cmd.extend([arg for path in present for arg in (_RO_BIND, path, path)])
 
 def mount_safe_config_dirs(cmd, home):
     """Mount only safe subdirectories from ~/.config."""
-    config_dir = os.path.join(home, ".config")
-    for subdir in SAFE_CONFIG_DIRS:
-        subdir_path = os.path.join(config_dir, subdir)
-        if os.path.exists(subdir_path):
-            cmd.extend(["--ro-bind", subdir_path, subdir_path])
+    config_dir = f"{home}/.config"
+    config_slash = config_dir + "/"
+    listing = _list_dir_names(config_dir, _SAFE_CONFIG_NAMES)
+    present = [
+        f"{config_slash}{subdir}"
+        for subdir in SAFE_CONFIG_DIRS
+        if subdir in listing
+    ]
+    cmd.extend([arg for path in present for arg in (_RO_BIND, path, path)])
 
 
 
-def build_bwrap_command(cli_path, args, tool_config, target_dir=None):
-    """Build the complete bwrap command with security options."""
-    home = str(Path.home())
+def exec_bwrap(cmd):
+    """Replace the current process with the bwrap command.
+
+    CPython ignores SIGPIPE and SIGXFSZ at startup, and exec keeps ignored
+    signals ignored, so restore their defaults (as subprocess does for its
+    children) before exec'ing. Raises FileNotFoundError if bwrap is missing.
+    """
+    for name in ("SIGPIPE", "SIGXFSZ"):
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            signal.signal(signum, signal.SIG_DFL)
+    # exec discards Python's stdio buffers
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execvp(cmd[0], cmd)
+
+
+def build_bwrap_command(cli_path, args, tool_config, target_dir=None,
+                        pwd_validated=False):
+    """Build the complete bwrap command with security options.
+
+    If pwd_validated is true the caller has already checked that target_dir
+    is an existing directory, and the check is not repeated here.
+    """
+    home = get_home()
     tool_name = tool_config["name"]
 
     if target_dir:
@@ -116,133 +273,139 @@ def build_bwrap_command(cli_path, args, tool_config, target_dir=None):
     elif args.dir:
         pwd = os.path.abspath(args.dir)
     else:
-        pwd = str(Path.cwd())
+        pwd = os.getcwd()
 
-    if not os.path.isdir(pwd):
+    if not pwd_validated and not is_directory(pwd):
         print(f"Error: Directory does not exist: {pwd}", file=sys.stderr)
         sys.exit(1)
 
-    cmd = ["bwrap", "--die-with-parent", "--unshare-pid", "--unshare-ipc"]
-
     # Network namespace: explicitly share or unshare
-    if args.no_network:
-        cmd.extend(["--unshare-net"])
-    else:
-        cmd.extend(["--share-net"])
+    network_part = ["--unshare-net" if args.no_network else "--share-net"]
 
     # Mount an isolated /tmp
     export_tmp = create_tmp_export_dir(tool_name)
-    cmd.extend(["--bind", export_tmp, "/tmp"])
-
+    system_part = [_BIND, export_tmp, "/tmp"]
     # Mount minimal /etc with only essential files
-    mount_minimal_etc(cmd)
+    mount_minimal_etc(system_part)
+    # System binaries and libraries (read-only)
+    system_part.extend([
+        arg
+        for p in ("/usr", "/lib", "/lib64") if os.path.exists(p)
+        for arg in (_RO_BIND, p, p)
+    ])
 
+    home_part = []
     if args.full_home_access:
         # Full home access (unsafe)
-        cmd.extend(["--bind", home, home]) 
+        home_part += [_BIND, home, home]
     else:
         # Safe mode: restrict to safe directories only
-        mount_safe_home_dirs(cmd, home)
+        mount_safe_home_dirs(home_part, home)
         # Mount safe .config subdirectories (excludes browsers to protect cookies/credentials)
-        mount_safe_config_dirs(cmd, home)
-
-    # System binaries and libraries (read-only)
-    for p in ["/usr", "/lib", "/lib64"]:
-        if os.path.exists(p):
-            cmd.extend(["--ro-bind", p, p])
-            
-    # Create /bin as symlink to /usr/bin for compatibility
-    cmd.extend(["--symlink", "/usr/bin", "/bin"])
+        mount_safe_config_dirs(home_part, home)
 
     # Tool-specific state directories (e.g., ~/.claude, ~/.gemini)
     global_tool_dir = f"{home}/.{tool_name}"
     if os.path.exists(global_tool_dir):
-        cmd.extend(["--bind", global_tool_dir, global_tool_dir])
+        home_part += [_BIND, global_tool_dir, global_tool_dir]
 
     # Tool-specific dot file in home (e.g., ~/.claude.json)
     if tool_config.get("home_dot_file"):
         dot_file = f"{home}/{tool_config['home_dot_file']}"
         if not os.path.exists(dot_file):
             # Create empty file so bind mount works if it doesn't exist
-            Path(dot_file).touch()
-        cmd.extend(["--bind", dot_file, dot_file])
-
-    # $PWD: read-only project directory
-    cmd.extend(["--ro-bind", pwd, pwd])
-    # $PWD/.tool_name: read-write overlay on top of read-only $PWD
-    project_tool_dir = Path(pwd) / f".{tool_name}"
-    ensure_tool_dir_exists(Path(pwd), tool_name) # ensures the directory exists before binding
-    cmd.extend(["--bind", str(project_tool_dir), str(project_tool_dir)])
-
-    # Process and device access
-    cmd.extend(["--proc", "/proc", "--dev-bind", "/dev", "/dev"])
-    # Root filesystem setup
-    cmd.extend(["--tmpfs", "/root"])
-    # Set working directory
-    cmd.extend(["--chdir", pwd])
+            # (plain open/close; unlike Path.touch there's no utime call)
+            os.close(os.open(dot_file, os.O_CREAT | os.O_WRONLY | os.O_CLOEXEC, 0o600))
+        home_part += [_BIND, dot_file, dot_file]
+
+    # $PWD: read-only project directory, with $PWD/.tool_name as a
+    # read-write overlay on top of it
+    project_tool_dir = f"{pwd}/.{tool_name}"
+    ensure_tool_dir_exists(pwd, tool_name) # ensures the directory exists before binding
+    project_part = [
+        _RO_BIND, pwd, pwd,
+        _BIND, project_tool_dir, project_tool_dir,
+        # Set working directory
+        "--chdir", pwd,
+    ]
 
     # Preserve essential environment variables
     path_env = os.getenv('PATH', '/usr/bin:/bin:/usr/sbin:/sbin')
     term_env = os.getenv('TERM', 'xterm')
-    cmd.extend([
+    env_part = [
         "--clearenv",
-        "--setenv", "HOME", home,
-        "--setenv", "PWD", pwd,
-        "--setenv", "USER", os.getenv('USER', 'user'),
-        "--setenv", "PATH", path_env,
-        "--setenv", "TERM", term_env,
+        _SETENV, "HOME", home,
+        _SETENV, "PWD", pwd,
+        _SETENV, "USER", os.getenv('USER', 'user'),
+        _SETENV, "PATH", path_env,
+        _SETENV, "TERM", term_env,
+    ]
+    # Pass through specified environment variables
+    pass_env = [(name, os.getenv(name)) for name in args.pass_env_vars]
+    env_part.extend([
+        arg
+        for name, value in pass_env if value is not None
+        for arg in (_SETENV, name, value)
     ])
 
-    # Pass through specified environment variables
-    for var_name in args.pass_env_vars:
-        var_value = os.getenv(var_name)
-        if var_value is not None:
-            cmd.extend(["--setenv", var_name, var_value])
+    # Mount additional paths (--allow-ro and --allow-rw); bwrap's -try
+    # variants skip paths that don't exist, so there's no need to stat them
+    extra_part = [
+        *(arg for ro_path in args.allow_ro_paths
+          for arg in (_RO_BIND_TRY, ro_path, ro_path)),
+        *(arg for rw_path in args.allow_rw_paths
+          for arg in (_BIND_TRY, rw_path, rw_path)),
+    ]
 
-    # Shell or CLI command
+    # Shell or CLI command; must come after all bwrap options
     if args.shell:
-        cmd.extend(["/bin/sh", "-i"])
+        tail = ["/bin/sh", "-i"]
     else:
-        cmd.append(cli_path)
+        tail = [cli_path]
         # Apply default arguments unless explicitly disabled by its flag
         if tool_config.get("default_args") and tool_config.get("default_args_flag"):
             if not getattr(args, tool_config["default_args_flag"]):
-                cmd.extend(tool_config["default_args"])
-        cmd.extend(args.cli_args)
-
-    # Mount additional paths (--allow-ro and --allow-rw)
-    for ro_path in args.allow_ro_paths:
-        if os.path.exists(ro_path):
-            cmd.extend(["--ro-bind", ro_path, ro_path])
-        else:
-            print(f"[bw-{tool_name}] Warning: --allow-ro path does not exist: {ro_path}", file=sys.stderr)
-
-    for rw_path in args.allow_rw_paths:
-        if os.path.exists(rw_path):
-            cmd.extend(["--bind", rw_path, rw_path])
-        else:
-            print(f"[bw-{tool_name}] Warning: --allow-rw path does not exist: {rw_path}", file=sys.stderr)
-
-    # Print debug info if verbose
-    if args.verbose:
-        print(f"[bw-{tool_name}] Working directory: {pwd}", file=sys.stderr)
-        print(f"[bw-{tool_name}] Export /tmp: {export_tmp}", file=sys.stderr)
-        print(f"[bw-{tool_name}] Network: {'disabled' if args.no_network else 'enabled'}",
-              file=sys.stderr)
-        print(f"[bw-{tool_name}] Home access: {'full (unsafe)' if args.full_home_access else 'safe (restricted)'}",
-              file=sys.stderr)
-        if args.shell:
-            print(f"[bw-{tool_name}] Mode: Interactive shell", file=sys.stderr)
-        if args.allow_ro_paths:
-            print(f"[bw-{tool_name}] Additional read-only paths: {', '.join(args.allow_ro_paths)}", file=sys.stderr)
-        if args.allow_rw_paths:
-            print(f"[bw-{tool_name}] Additional read-write paths: {', '.join(args.allow_rw_paths)}", file=sys.stderr)
-        print(f"[bw-{tool_name}] Command: {' '.join(cmd)}", file=sys.stderr)
+                tail += tool_config["default_args"]
+        tail += args.cli_args
+
+    cmd = [
+        _find_bwrap(),
+        *_STATIC_BWRAP_PREFIX,
+        *network_part,
+        *system_part,
+        *home_part,
+        *project_part,
+        *env_part,
+        *extra_part,
+        *tail,
+    ]
+
+    # Debug info is only formatted when verbose is set
+    if not args.verbose:
+        return cmd
+
+    print(f"[bw-{tool_name}] Working directory: {pwd}", file=sys.stderr)
+    print(f"[bw-{tool_name}] Export /tmp: {export_tmp}", file=sys.stderr)
+    print(f"[bw-{tool_name}] Network: {'disabled' if args.no_network else 'enabled'}",
+          file=sys.stderr)
+    print(f"[bw-{tool_name}] Home access: {'full (unsafe)' if args.full_home_access else 'safe (restricted)'}",
+          file=sys.stderr)
+    if args.shell:
+        print(f"[bw-{tool_name}] Mode: Interactive shell", file=sys.stderr)
+    if args.allow_ro_paths:
+        print(f"[bw-{tool_name}] Additional read-only paths: {', '.join(args.allow_ro_paths)}", file=sys.stderr)
+    if args.allow_rw_paths:
+        print(f"[bw-{tool_name}] Additional read-write paths: {', '.join(args.allow_rw_paths)}", file=sys.stderr)
+    # Let print write each argument rather than building one joined string
+    print(f"[bw-{tool_name}] Command:", *cmd, file=sys.stderr)
 
     return cmd
 
 def parse_args(prog_name, tool_name, tool_config):
     """Parse command-line arguments."""
+    # Imported lazily: argparse is only needed when parsing the command line
+    import argparse
+
     parser = argparse.ArgumentParser(
         prog=prog_name,
         description=f"Bubblewrap sandboxing wrapper for {tool_name.capitalize()} CLI",